@@ -1,5 +1,6 @@
 import numpy as np
 import random
+from collections import OrderedDict
 
 # Default values (can be overridden in main.py)
 patch_width = 21  # Must be odd
@@ -15,7 +16,7 @@ def grid(width, height):
     maze = [[1 for x in range(width)] for y in range(height)]
     return maze
 
-def dfs(maze, width, height):
+def dfs(maze, width, height, rng=random):
     """Depth-first search maze generation algorithm"""
     stack = [(1, 1)]
     maze[1][1] = 0
@@ -25,7 +26,7 @@ def dfs(maze, width, height):
         moved = False
 
         directions = [(2, 0), (-2, 0), (0, 2), (0, -2)]
-        random.shuffle(directions)
+        rng.shuffle(directions)
 
         for dx, dy in directions:
             nx, ny = x + dx, y + dy
@@ -220,6 +221,114 @@ def finalMaze(patch_width, patch_height, num_patches_x, num_patches_y, num_stitc
     
     return large_maze
 
+class LazyMaze:
+    """
+    Unbounded braided maze whose patches are generated on demand
+
+    Every patch and stitch is derived from (seed, patch_x, patch_y), so any
+    cell can be looked up without building the rest of the maze. Patches are
+    kept in an LRU cache and rebuilt identically if they are evicted.
+    Patch coordinates can be any integer, including negative ones.
+
+    The cache only bounds the memory used by patches. It should hold every
+    patch a solver keeps coming back to: a lazy_solve search touches roughly
+    1.5 times the patches in the box between start and goal, and patches
+    evicted before the search is done get generated again. With the default
+    21x21 patches each one takes about 5 KB, so 4096 patches is about 20 MB.
+
+    :param seed: Seed the whole maze is derived from
+    :param patch_width: Width of each patch (must be odd)
+    :param patch_height: Height of each patch (must be odd)
+    :param num_stitches: Number of stitches between patches
+    :param cache_size: Maximum number of patches kept in memory
+    """
+
+    def __init__(self, seed, patch_width=21, patch_height=21, num_stitches=2, cache_size=4096):
+        if patch_width < 3 or patch_width % 2 == 0 or patch_height < 3 or patch_height % 2 == 0:
+            raise ValueError("Patch width and height must be odd and at least 3")
+        if cache_size < 1:
+            raise ValueError("cache_size must be at least 1")
+
+        self.seed = seed
+        self.patch_width = patch_width
+        self.patch_height = patch_height
+        self.num_stitches = num_stitches
+        self.cache_size = cache_size
+
+        # Patches overlap like in finalMaze, so each one adds size - 1 cells
+        self.step_x = patch_width - 1
+        self.step_y = patch_height - 1
+
+        self.patches = OrderedDict()
+        self.stitches = OrderedDict()
+        self.evictions = 0  # Patches dropped from the cache so far
+
+    def cached(self, cache, key, build, limit):
+        """Look up key in an LRU cache, building and evicting as needed"""
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        value = build()
+        cache[key] = value
+        if len(cache) > limit:
+            cache.popitem(last=False)
+            if cache is self.patches:
+                self.evictions += 1
+        return value
+
+    def patch(self, px, py):
+        """Return the patch at patch coordinates (px, py)"""
+        def build():
+            rng = random.Random(f"{self.seed}:patch:{px}:{py}")
+            patch = grid(self.patch_width, self.patch_height)
+            return dfs(patch, self.patch_width, self.patch_height, rng)
+
+        return self.cached(self.patches, (px, py), build, self.cache_size)
+
+    def stitch(self, direction, px, py):
+        """
+        Return the stitched positions on the shared wall before patch (px, py)
+
+        'horizontal' is the wall between (px - 1, py) and (px, py), and the result
+        holds local rows. 'vertical' is the wall between (px, py - 1) and (px, py),
+        and the result holds local columns.
+        """
+        def build():
+            patch = self.patch(px, py)
+            if direction == 'horizontal':
+                before = self.patch(px - 1, py)
+                candidates = [r for r in range(1, self.patch_height - 1)
+                              if before[r][self.patch_width - 2] == 0 and patch[r][1] == 0]
+            else:
+                before = self.patch(px, py - 1)
+                candidates = [c for c in range(1, self.patch_width - 1)
+                              if before[self.patch_height - 2][c] == 0 and patch[1][c] == 0]
+
+            rng = random.Random(f"{self.seed}:{direction}:{px}:{py}")
+            return frozenset(rng.sample(candidates, min(self.num_stitches, len(candidates))))
+
+        # Each patch owns the two walls before it
+        return self.cached(self.stitches, (direction, px, py), build, 2 * self.cache_size)
+
+    def cell(self, row, col):
+        """Return the value of the cell at (row, col): 0 for path, 1 for wall"""
+        py, local_row = divmod(row, self.step_y)
+        px, local_col = divmod(col, self.step_x)
+
+        if local_row == 0 and local_col == 0:
+            # Corners where four patches meet are always walls
+            return 1
+        if local_col == 0:
+            return 0 if local_row in self.stitch('horizontal', px, py) else 1
+        if local_row == 0:
+            return 0 if local_col in self.stitch('vertical', px, py) else 1
+        return self.patch(px, py)[local_row][local_col]
+
+    def window(self, top, left, height, width):
+        """Copy a rectangular region into a regular maze (list of rows)"""
+        return [[self.cell(top + y, left + x) for x in range(width)] for y in range(height)]
+
 def testMaze(maze):
     """Print the maze to the console"""
     for row in maze:
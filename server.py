@@ -0,0 +1,595 @@
+import asyncio
+import multiprocessing
+import os
+import random
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qsl
+
+from generation import grid, dfs, finalMaze
+from solver import mouse, find_goal
+
+# Default values (can be overridden when calling serve())
+HOST = '127.0.0.1'
+PORT = 8765
+MAX_WORKERS = None       # None = one worker per CPU
+BATCH_SIZE = 16          # Solve requests collected before dispatching to the pool
+BATCH_DELAY = 0.005      # Seconds to wait for more solve requests before dispatching
+
+NO_GOAL = 0xFFFF         # Sentinel for "use the goal cell stored in the maze"
+MAX_DIMENSION = 0xFFFF   # Largest width/height the maze header can hold
+MAX_CELLS = 4000000      # Largest maze (width * height) the server will build or solve
+MAX_BODY = 16 * 1024 * 1024  # Largest request body accepted, in bytes
+MAX_HEADERS = 100        # Most header lines read for one request
+
+MAZE_HEADER = struct.Struct('<HH')         # height, width
+POINT = struct.Struct('<HH')               # row, col
+SOLVE_HEADER = struct.Struct('<HHHH')      # start row/col, goal row/col
+COUNT = struct.Struct('<I')
+
+
+# ==========================================
+# BINARY FORMAT
+# ==========================================
+
+def pack_maze(maze):
+    """Pack a maze into bytes: height, width, then 2 bits per cell"""
+    height = len(maze)
+    width = len(maze[0])
+    cells = bytearray((height * width + 3) // 4)
+    i = 0
+    for row in maze:
+        for cell in row:
+            cells[i >> 2] |= cell << ((i & 3) * 2)
+            i += 1
+    return MAZE_HEADER.pack(height, width) + bytes(cells)
+
+def unpack_maze(data, offset=0):
+    """Unpack a maze written by pack_maze, returns (maze, next_offset)"""
+    height, width = MAZE_HEADER.unpack_from(data, offset)
+    offset += MAZE_HEADER.size
+    if height * width > MAX_CELLS:
+        raise ValueError(f"Maze has more than {MAX_CELLS} cells")
+    size = (height * width + 3) // 4
+    cells = data[offset:offset + size]
+    if height == 0 or width == 0 or len(cells) != size:
+        raise ValueError("Truncated or empty maze")
+    maze = []
+    i = 0
+    for y in range(height):
+        row = []
+        for x in range(width):
+            row.append((cells[i >> 2] >> ((i & 3) * 2)) & 3)
+            i += 1
+        maze.append(row)
+    return maze, offset + size
+
+def pack_path(path):
+    """Pack a solution path: count, then (row, col) pairs. Count 0 means no path"""
+    if not path:
+        return COUNT.pack(0)
+    return COUNT.pack(len(path)) + b''.join(POINT.pack(r, c) for r, c in path)
+
+def unpack_path(data, offset=0):
+    """Unpack a path written by pack_path, returns (path or None, next_offset)"""
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    path = []
+    for _ in range(count):
+        path.append(POINT.unpack_from(data, offset))
+        offset += POINT.size
+    return (path or None), offset
+
+def pack_solve(maze, start, goal=None):
+    """Pack a solve request. Without a goal, the server uses the maze's goal cell"""
+    goal_row, goal_col = goal if goal else (NO_GOAL, NO_GOAL)
+    return SOLVE_HEADER.pack(start[0], start[1], goal_row, goal_col) + pack_maze(maze)
+
+def unpack_solve(data, offset=0):
+    """Unpack a solve request, returns ((maze, start, goal), next_offset)"""
+    start_row, start_col, goal_row, goal_col = SOLVE_HEADER.unpack_from(data, offset)
+    maze, offset = unpack_maze(data, offset + SOLVE_HEADER.size)
+    goal = None if goal_row == NO_GOAL else (goal_row, goal_col)
+    return (maze, (start_row, start_col), goal), offset
+
+def check_solve(data):
+    """Check a solve request's headers and length without decoding the maze"""
+    SOLVE_HEADER.unpack_from(data, 0)
+    height, width = MAZE_HEADER.unpack_from(data, SOLVE_HEADER.size)
+    if height == 0 or width == 0:
+        raise ValueError("Empty maze")
+    if height * width > MAX_CELLS:
+        raise ValueError(f"Maze has more than {MAX_CELLS} cells")
+    if len(data) != SOLVE_HEADER.size + MAZE_HEADER.size + (height * width + 3) // 4:
+        raise ValueError("Maze data doesn't match its size")
+
+def pack_batch(items):
+    """Pack a list of byte strings as count + length-prefixed items"""
+    return COUNT.pack(len(items)) + b''.join(COUNT.pack(len(item)) + item for item in items)
+
+def unpack_batch(data):
+    """Split data written by pack_batch back into its items"""
+    (count,) = COUNT.unpack_from(data, 0)
+    offset = COUNT.size
+    items = []
+    for _ in range(count):
+        (size,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        if offset + size > len(data):
+            raise ValueError("Truncated batch")
+        items.append(data[offset:offset + size])
+        offset += size
+    return items
+
+
+# ==========================================
+# WORKER FUNCTIONS (run in the process pool)
+# ==========================================
+
+def init_worker():
+    """Set up a worker: fresh random state and no console output"""
+    random.seed()
+    # finalMaze and mouse print progress meant for main.py, which would
+    # otherwise end up in the server's output once per request
+    sys.stdout = open(os.devnull, 'w')
+
+def generate_maze(params):
+    """Generate a packed maze from request parameters"""
+    # Always reseed, otherwise a seeded request leaves this worker's random
+    # state fixed for every unseeded request after it (None reseeds from the OS)
+    random.seed(params.get('seed'))
+
+    if params.get('type', 'braided') == 'simple':
+        width = params.get('width', 41)
+        height = params.get('height', 41)
+        maze = grid(width, height)
+        maze = dfs(maze, width, height)
+        maze[1][0] = 0  # Entrance
+        maze[height - 2][width - 1] = 0  # Exit
+    else:
+        maze = finalMaze(
+            patch_width=params.get('patch_width', 21),
+            patch_height=params.get('patch_height', 21),
+            num_patches_x=params.get('num_patches_x', 3),
+            num_patches_y=params.get('num_patches_y', 3),
+            num_stitches=params.get('num_stitches', 2)
+        )
+    return pack_maze(maze)
+
+def solve_one(maze, start, goal):
+    """Solve a single maze, returns the path or None"""
+    if goal is None:
+        goal = find_goal(maze)
+        if goal is None:
+            # No goal cell, fall back to the exit like the GUI does
+            goal = (len(maze) - 2, len(maze[0]) - 1)
+    for row, col in (start, goal):
+        if not (0 <= row < len(maze) and 0 <= col < len(maze[0])) or maze[row][col] == 1:
+            return None
+    return mouse(goal[0], goal[1], start, maze)
+
+def solve_batch(requests):
+    """
+    Solve a list of packed solve requests, returns a list of packed paths
+
+    A request that can't be decoded gets an empty result instead of failing
+    the rest of the batch.
+    """
+    results = []
+    for request in requests:
+        try:
+            (maze, start, goal), _ = unpack_solve(request)
+        except (ValueError, struct.error):
+            results.append(b'')
+            continue
+        results.append(pack_path(solve_one(maze, start, goal)))
+    return results
+
+
+# ==========================================
+# SERVER
+# ==========================================
+
+def split_batch(items, workers):
+    """Split items into at most `workers` chunks of nearly equal size"""
+    size = max(1, -(-len(items) // workers))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class SolveBatcher:
+    """
+    Collect solve requests that arrive close together and send them to the pool
+
+    Each flushed batch is split into one chunk per worker, so batching saves
+    per-task overhead without putting every solve on the same worker.
+    """
+
+    def __init__(self, pool, workers, batch_size=BATCH_SIZE, batch_delay=BATCH_DELAY):
+        self.pool = pool
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.pending = []
+        self.timer = None
+
+    def submit(self, request):
+        """Queue a packed solve request, returns a future for its packed path"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((request, future))
+
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.batch_delay, self.flush)
+        return future
+
+    def flush(self):
+        """Dispatch everything queued so far, one worker task per chunk"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, []
+        for chunk in split_batch(batch, self.workers):
+            self.dispatch(chunk)
+
+    def dispatch(self, chunk):
+        """Run one chunk of (request, future) pairs in the pool"""
+        loop = asyncio.get_running_loop()
+        try:
+            task = loop.run_in_executor(self.pool, solve_batch, [request for request, _ in chunk])
+        except Exception as e:
+            # A broken pool raises here, which would leave the futures waiting forever
+            for _, future in chunk:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        def done(task):
+            futures = [future for _, future in chunk]
+            if task.cancelled():
+                # e.g. the pool was shut down with this chunk still queued
+                error = RuntimeError("Solve batch was cancelled")
+            else:
+                error = task.exception()
+            if error is not None:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(error)
+                return
+            for future, result in zip(futures, task.result()):
+                if not future.done():
+                    future.set_result(result)
+
+        task.add_done_callback(done)
+
+
+class MazeServer:
+    """HTTP/1.1 server exposing generate, solve and batch-solve endpoints
+
+    Endpoints:
+        GET  /generate?type=braided&patch_width=21&...&seed=1  -> packed maze
+        POST /solve        body: packed solve request          -> packed path
+        POST /batch-solve  body: batch of packed solve requests -> batch of packed paths
+                           (an empty item means that request was rejected)
+
+    Workers are not forked, so scripts that create a server need the usual
+    if __name__ == "__main__" guard.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, batch_size=BATCH_SIZE, batch_delay=BATCH_DELAY):
+        # Workers are started on demand while connections are open. Forked
+        # workers would inherit those sockets and keep them alive after the
+        # server closes them, so start them from a clean process instead
+        try:
+            context = multiprocessing.get_context('forkserver')
+        except ValueError:
+            context = multiprocessing.get_context('spawn')
+        self.pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                        initializer=init_worker)
+        self.workers = max_workers or os.cpu_count() or 1
+        self.batcher = SolveBatcher(self.pool, self.workers, batch_size, batch_delay)
+        self.server = None
+        self.connections = {}
+
+    async def start(self, host=HOST, port=PORT, path=None):
+        """Start listening on TCP, or on a Unix socket if path is given"""
+        if path:
+            self.server = await asyncio.start_unix_server(self.handle_connection, path=path)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+    async def close(self):
+        """Stop the server and shut down the worker pool"""
+        if self.server is not None:
+            self.server.close()
+        # Handlers for idle keep-alive connections are still waiting on a read,
+        # closing their transports lets them see EOF and finish. This has to
+        # happen before wait_closed(), which waits for them on Python 3.12.1+
+        for writer in list(self.connections.values()):
+            writer.close()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        self.pool.shutdown()
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one connection until the client closes it"""
+        task = asyncio.current_task()
+        self.connections[task] = writer
+        try:
+            while True:
+                try:
+                    request_line, headers = await self.read_head(reader)
+                except ValueError as e:
+                    # A line over the stream limit or too many headers, the
+                    # rest of the request can't be found, so answer and drop it
+                    await self.respond(writer, "400 Bad Request", str(e).encode(), close=True)
+                    break
+                if not request_line:
+                    break
+
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= MAX_BODY:
+                    # The body can't be skipped safely, so answer and drop the connection
+                    await self.respond(writer, "400 Bad Request", b"Invalid Content-Length", close=True)
+                    break
+
+                body = await reader.readexactly(length)
+                status, payload = await self.dispatch(request_line, body)
+                close = headers.get('connection', '').lower() == 'close'
+                await self.respond(writer, status, payload, close)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections.pop(task, None)
+            writer.close()
+
+    async def read_head(self, reader):
+        """Read a request line and its headers, returns (request line, headers)"""
+        headers = {}
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return request_line, headers
+
+            for _ in range(MAX_HEADERS + 1):
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    return request_line, headers
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+        except (ValueError, asyncio.LimitOverrunError):
+            # readline raises ValueError for lines longer than the stream limit
+            raise ValueError("Request line or header too long")
+        raise ValueError(f"More than {MAX_HEADERS} header lines")
+
+    async def respond(self, writer, status, payload, close=False):
+        """Write one HTTP response"""
+        head = (
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: application/octet-stream\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+        )
+        if close:
+            head += "Connection: close\r\n"
+        writer.write((head + "\r\n").encode('latin-1') + payload)
+        await writer.drain()
+
+    async def dispatch(self, request_line, body):
+        """Route a request, returns (status line, response bytes)"""
+        try:
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            return "400 Bad Request", b"Malformed request line"
+
+        url = urlsplit(target)
+        loop = asyncio.get_running_loop()
+        try:
+            if method == 'GET' and url.path == '/generate':
+                params = parse_generate_params(url.query)
+                payload = await loop.run_in_executor(self.pool, generate_maze, params)
+            elif method == 'POST' and url.path == '/solve':
+                # Only the headers are checked here, decoding is left to the workers
+                check_solve(body)
+                payload = await self.batcher.submit(body)
+                if not payload:
+                    return "400 Bad Request", b"Invalid solve request"
+            elif method == 'POST' and url.path == '/batch-solve':
+                requests = unpack_batch(body)
+                for request in requests:
+                    check_solve(request)
+                chunks = await asyncio.gather(*[
+                    loop.run_in_executor(self.pool, solve_batch, chunk)
+                    for chunk in split_batch(requests, self.workers)
+                ])
+                payload = pack_batch([result for chunk in chunks for result in chunk])
+            else:
+                return "404 Not Found", b"Unknown endpoint"
+        except struct.error:
+            return "400 Bad Request", b"Truncated request body"
+        except ValueError as e:
+            return "400 Bad Request", str(e).encode()
+        except Exception as e:
+            # e.g. BrokenProcessPool, the details stay in the server log
+            print(f"Error handling {method} {url.path}: {e!r}")
+            return "500 Internal Server Error", b"Internal server error"
+        return "200 OK", payload
+
+
+def parse_generate_params(query):
+    """Parse and validate /generate query parameters"""
+    params = {}
+    for name, value in parse_qsl(query):
+        if name == 'type':
+            if value not in ('simple', 'braided'):
+                raise ValueError("type must be 'simple' or 'braided'")
+            params[name] = value
+        elif name in ('seed', 'width', 'height', 'patch_width', 'patch_height',
+                      'num_patches_x', 'num_patches_y', 'num_stitches'):
+            params[name] = int(value)
+        else:
+            raise ValueError(f"Unknown parameter: {name}")
+
+    for name in ('width', 'height', 'patch_width', 'patch_height'):
+        if name in params and (params[name] < 3 or params[name] % 2 == 0):
+            raise ValueError(f"{name} must be odd and at least 3")
+    for name in ('num_patches_x', 'num_patches_y'):
+        if name in params and params[name] < 1:
+            raise ValueError(f"{name} must be at least 1")
+
+    # Check the final size before any work is sent to the pool
+    if params.get('type', 'braided') == 'simple':
+        width = params.get('width', 41)
+        height = params.get('height', 41)
+    else:
+        # Patches share their edge walls, see finalMaze
+        num_patches_x = params.get('num_patches_x', 3)
+        num_patches_y = params.get('num_patches_y', 3)
+        width = params.get('patch_width', 21) * num_patches_x - (num_patches_x - 1)
+        height = params.get('patch_height', 21) * num_patches_y - (num_patches_y - 1)
+    if width > MAX_DIMENSION or height > MAX_DIMENSION:
+        raise ValueError(f"Maze width and height must be at most {MAX_DIMENSION}")
+    if width * height > MAX_CELLS:
+        raise ValueError(f"Maze must have at most {MAX_CELLS} cells")
+    return params
+
+
+# ==========================================
+# CLIENT
+# ==========================================
+
+class MazeClient:
+    """Loopback client for MazeServer, keeps one connection open
+
+    Requests on the connection are sent one at a time. Use several clients
+    to have the server batch concurrent solves.
+    """
+
+    def __init__(self, host=HOST, port=PORT, path=None):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.reader = None
+        self.writer = None
+        self.lock = asyncio.Lock()
+
+    async def connect(self):
+        if self.path:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+        self.reader = None
+        self.writer = None
+
+    def drop(self):
+        """Close the connection without waiting, so the next request reconnects"""
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, target, body=b''):
+        """Send one request, returns the response body or raises RuntimeError
+
+        Raises ConnectionError if the server drops the connection. The next
+        request opens a new one.
+        """
+        async with self.lock:
+            if self.writer is None:
+                await self.connect()
+            try:
+                status_line, headers, payload = await self._request(method, target, body)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                self.drop()
+                raise ConnectionError(f"Connection to maze server lost: {e}") from e
+            except BaseException:
+                # Cancelled (e.g. by wait_for) or failed part way through: the
+                # reply may still be on the socket and would be read as the
+                # answer to the next request
+                self.drop()
+                raise
+
+            if headers.get('connection', '').lower() == 'close':
+                self.drop()
+
+        status = status_line.decode('latin-1').split(' ', 2)
+        if len(status) < 2 or status[1] != '200':
+            raise RuntimeError(f"{status_line.decode('latin-1').strip()}: {payload.decode(errors='replace')}")
+        return payload
+
+    async def _request(self, method, target, body):
+        """Do one request/response exchange, returns (status line, headers, body)"""
+        self.writer.write(
+            f"{method} {target} HTTP/1.1\r\n"
+            f"Host: {self.host}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+        )
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("server closed the connection")
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        payload = await self.reader.readexactly(int(headers.get('content-length', 0)))
+        return status_line, headers, payload
+
+    async def generate(self, **params):
+        """Generate a maze, accepts the same parameters as /generate"""
+        query = '&'.join(f"{name}={value}" for name, value in params.items())
+        maze, _ = unpack_maze(await self.request('GET', f"/generate?{query}"))
+        return maze
+
+    async def solve(self, maze, start, goal=None):
+        """Solve a maze from start to goal (or to its goal cell)"""
+        path, _ = unpack_path(await self.request('POST', '/solve', pack_solve(maze, start, goal)))
+        return path
+
+    async def batch_solve(self, problems):
+        """Solve a list of (maze, start, goal) tuples in one request"""
+        body = pack_batch([pack_solve(maze, start, goal) for maze, start, goal in problems])
+        results = unpack_batch(await self.request('POST', '/batch-solve', body))
+        if not all(results):
+            raise ValueError("The server rejected part of the batch")
+        return [unpack_path(result)[0] for result in results]
+
+
+async def serve(host=HOST, port=PORT, path=None, max_workers=MAX_WORKERS):
+    """Run the maze server until cancelled"""
+    server = MazeServer(max_workers=max_workers)
+    await server.start(host, port, path)
+    print(f"Maze server listening on {path or f'{host}:{port}'}")
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
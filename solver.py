@@ -1,5 +1,6 @@
 from generation import * 
 from collections import deque
+import heapq
 
 def neighboring_cells(maze, current_row, current_col):
     neighbors = []
@@ -81,4 +82,71 @@ def mouse(goal_row, goal_col, start_pos, large_maze):
         current_col = next_col
         path.append((current_row, current_col))
     
-    return path
\ No newline at end of file
+    return path
+
+
+def lazy_solve(lazy_maze, start_pos, goal_pos, max_cells=500000):
+    """
+    A* search on a LazyMaze, which has no bounds and can't be flood filled
+
+    Only patches near the search frontier get generated. Gives up and returns
+    None after visiting max_cells cells.
+
+    The LazyMaze cache_size only bounds patch memory. The search keeps its own
+    record of every cell it reaches, about 260 bytes per visited cell, so
+    max_cells is what bounds the rest (500000 cells is roughly 130 MB).
+    The number of visited cells grows with the area between start and goal:
+    a goal 400 rows and 800 columns away visits about 215000 cells.
+    """
+    # Positions are dict keys below, so accept lists like mouse does
+    start_pos = tuple(start_pos)
+    goal_pos = tuple(goal_pos)
+    goal_row, goal_col = goal_pos
+    if lazy_maze.cell(*start_pos) == 1 or lazy_maze.cell(goal_row, goal_col) == 1:
+        return None
+
+    def estimate(row, col):
+        return abs(row - goal_row) + abs(col - goal_col)
+
+    def finish(path):
+        # Patches evicted mid-search get generated again, which gets slow fast
+        evicted = lazy_maze.evictions - evictions
+        if evicted:
+            print(f"Patch cache evicted {evicted} patches during the search, "
+                  f"consider a cache_size larger than {lazy_maze.cache_size}")
+        return path
+
+    came_from = {start_pos: None}
+    cost = {start_pos: 0}
+    queue = [(estimate(*start_pos), 0, start_pos)]
+    visited = 0
+    evictions = lazy_maze.evictions
+
+    while queue:
+        _, steps, current = heapq.heappop(queue)
+        if steps > cost[current]:
+            continue  # Stale queue entry
+
+        if current == goal_pos:
+            path = []
+            while current is not None:
+                path.append(current)
+                current = came_from[current]
+            return finish(path[::-1])
+
+        visited += 1
+        if visited > max_cells:
+            print("Search limit reached before finding the goal!")
+            return finish(None)
+
+        for dr, dc in [(1, 0), (-1, 0), (0, -1), (0, 1)]:
+            neighbor = (current[0] + dr, current[1] + dc)
+            if lazy_maze.cell(*neighbor) == 1:
+                continue
+            if steps + 1 < cost.get(neighbor, float('inf')):
+                cost[neighbor] = steps + 1
+                came_from[neighbor] = current
+                heapq.heappush(queue, (steps + 1 + estimate(*neighbor), steps + 1, neighbor))
+
+    print("No path to goal found!")
+    return finish(None)
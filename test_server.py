@@ -0,0 +1,200 @@
+import asyncio
+
+import pytest
+
+from server import (MazeServer, MazeClient, pack_maze, unpack_maze, pack_path, unpack_path,
+                    pack_solve, unpack_solve)
+
+
+def run_with_server(test):
+    """Start a MazeServer on a free loopback port, run test(server, port), then shut down"""
+    async def main():
+        server = MazeServer(max_workers=2)
+        await server.start(port=0)
+        port = server.server.sockets[0].getsockname()[1]
+        try:
+            await test(server, port)
+        finally:
+            await server.close()
+    asyncio.run(main())
+
+async def raw_request(port, data):
+    """Send raw bytes and return everything the server sends back before closing"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(data)
+    await writer.drain()
+    response = await asyncio.wait_for(reader.read(), 10)
+    writer.close()
+    return response
+
+def check_path(maze, path, start, goal):
+    """Assert path walks open cells one step at a time from start to goal"""
+    assert path[0] == tuple(start)
+    assert path[-1] == tuple(goal)
+    for (r1, c1), (r2, c2) in zip(path, path[1:]):
+        assert abs(r1 - r2) + abs(c1 - c2) == 1
+    for row, col in path:
+        assert maze[row][col] != 1
+
+
+def test_pack_round_trip():
+    maze = [[1, 0, 2], [0, 1, 0]]
+    assert unpack_maze(pack_maze(maze)) == (maze, len(pack_maze(maze)))
+    assert unpack_path(pack_path([(1, 2), (3, 4)]))[0] == [(1, 2), (3, 4)]
+    assert unpack_path(pack_path(None))[0] is None
+    (decoded, start, goal), _ = unpack_solve(pack_solve(maze, (1, 0)))
+    assert (decoded, start, goal) == (maze, (1, 0), None)
+
+
+def test_generate_is_deterministic_with_seed():
+    async def test(server, port):
+        client = MazeClient(port=port)
+        first = await client.generate(seed=7, patch_width=11, patch_height=11)
+        second = await client.generate(seed=7, patch_width=11, patch_height=11)
+        other = await client.generate(seed=8, patch_width=11, patch_height=11)
+        assert first == second
+        assert first != other
+        # 3 patches of 11 sharing their edge walls
+        assert (len(first), len(first[0])) == (31, 31)
+
+        simple = await client.generate(type='simple', width=15, height=9)
+        assert (len(simple), len(simple[0])) == (9, 15)
+        await client.close()
+    run_with_server(test)
+
+
+def test_solve():
+    async def test(server, port):
+        client = MazeClient(port=port)
+        maze = await client.generate(seed=1, patch_width=11, patch_height=11)
+        goal = next((r, c) for r, row in enumerate(maze) for c, cell in enumerate(row) if cell == 2)
+
+        # Without a goal the server uses the maze's goal cell
+        check_path(maze, await client.solve(maze, (1, 0)), (1, 0), goal)
+        exit_pos = (len(maze) - 2, len(maze[0]) - 1)
+        check_path(maze, await client.solve(maze, (1, 0), exit_pos), (1, 0), exit_pos)
+
+        # Goal inside a wall
+        assert await client.solve(maze, (1, 0), (0, 0)) is None
+        await client.close()
+    run_with_server(test)
+
+
+def test_concurrent_solves_are_batched():
+    async def test(server, port):
+        maze = [[0] * 21 for _ in range(21)]
+        clients = [MazeClient(port=port) for _ in range(6)]
+        paths = await asyncio.gather(*[
+            client.solve(maze, (0, 0), (i, 20)) for i, client in enumerate(clients)
+        ])
+        for i, path in enumerate(paths):
+            check_path(maze, path, (0, 0), (i, 20))
+        for client in clients:
+            await client.close()
+    run_with_server(test)
+
+
+def test_batch_solve_keeps_order():
+    async def test(server, port):
+        client = MazeClient(port=port)
+        maze = [[0] * 21 for _ in range(21)]
+        goals = [(i, 20) for i in range(0, 21, 4)]
+        paths = await client.batch_solve([(maze, (0, 0), goal) for goal in goals])
+        assert len(paths) == len(goals)
+        for goal, path in zip(goals, paths):
+            check_path(maze, path, (0, 0), goal)
+        assert await client.batch_solve([]) == []
+        await client.close()
+    run_with_server(test)
+
+
+def test_bad_requests():
+    async def test(server, port):
+        client = MazeClient(port=port)
+        for params in ({'width': 4, 'type': 'simple'}, {'type': 'round'}, {'colour': 1},
+                       {'type': 'simple', 'width': 70001, 'height': 3},
+                       {'patch_width': 21, 'num_patches_x': 1000, 'num_patches_y': 1000}):
+            with pytest.raises(RuntimeError, match='400'):
+                await client.generate(**params)
+
+        with pytest.raises(RuntimeError, match='400'):
+            await client.request('POST', '/solve', b'\x01\x00')
+        with pytest.raises(RuntimeError, match='400'):
+            await client.request('POST', '/solve', pack_solve([[0, 0]], (0, 0))[:-1])
+        with pytest.raises(RuntimeError, match='400'):
+            # Header claims a maze over the cell budget
+            await client.request('POST', '/solve', b'\x00' * 8 + b'\xff\xff\xff\xff')
+        with pytest.raises(RuntimeError, match='404'):
+            await client.request('GET', '/nowhere')
+        with pytest.raises(RuntimeError, match='404'):
+            await client.request('GET', '/solve')
+
+        # The connection survives rejected requests
+        assert await client.generate(type='simple', width=5, height=5)
+        await client.close()
+    run_with_server(test)
+
+
+def test_malformed_http_gets_400_and_close():
+    async def test(server, port):
+        for data in (b"POST /solve HTTP/1.1\r\nContent-Length: abc\r\n\r\n",
+                     b"POST /solve HTTP/1.1\r\nContent-Length: 999999999\r\n\r\n",
+                     b"GET /" + b"a" * 70000 + b" HTTP/1.1\r\n\r\n",
+                     b"GET /generate HTTP/1.1\r\n" + b"X: y\r\n" * 200 + b"\r\n"):
+            response = await raw_request(port, data)
+            assert response.startswith(b"HTTP/1.1 400 ")
+            assert b"Connection: close\r\n" in response
+    run_with_server(test)
+
+
+def test_connection_close_header():
+    async def test(server, port):
+        response = await raw_request(
+            port, b"GET /generate?type=simple&width=5&height=5 HTTP/1.1\r\nConnection: close\r\n\r\n")
+        assert response.startswith(b"HTTP/1.1 200 ")
+        assert b"Connection: close\r\n" in response
+        maze, _ = unpack_maze(response.split(b"\r\n\r\n", 1)[1])
+        assert (len(maze), len(maze[0])) == (5, 5)
+    run_with_server(test)
+
+
+def test_client_reconnects_after_server_closes():
+    async def test(server, port):
+        client = MazeClient(port=port)
+        await client.generate(type='simple', width=5, height=5)
+
+        # Server drops the connection (as it does after Connection: close)
+        for writer in list(server.connections.values()):
+            writer.close()
+        await asyncio.sleep(0.1)
+
+        with pytest.raises(ConnectionError):
+            await client.generate(type='simple', width=5, height=5)
+        assert len(await client.generate(type='simple', width=7, height=7)) == 7
+        await client.close()
+    run_with_server(test)
+
+
+def test_cancelled_request_does_not_leak_its_reply():
+    async def test(server, port):
+        client = MazeClient(port=port)
+        await client.generate(type='simple', width=5, height=5)
+
+        big = [[0] * 801 for _ in range(801)]
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.solve(big, (0, 0), (800, 800)), 0.05)
+        maze = await client.generate(type='simple', width=11, height=11)
+        assert (len(maze), len(maze[0])) == (11, 11)
+        await client.close()
+    run_with_server(test)
+
+
+def test_close_with_connected_client():
+    async def test(server, port):
+        client = MazeClient(port=port)
+        await client.generate(type='simple', width=5, height=5)
+        await asyncio.wait_for(server.close(), 10)
+        with pytest.raises(ConnectionError):
+            await client.generate(type='simple', width=5, height=5)
+        await client.close()
+    run_with_server(test)